@@ -4,7 +4,7 @@ import subprocess
 import threading
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
@@ -196,15 +196,21 @@ class RedshiftApp(ttk.Window):
         os.environ["REDSHIFT_USER"] = user
         os.environ["REDSHIFT_PASSWORD"] = password
 
-        # ✅ Persist to .env file
+        # ✅ Persist to .env file, keeping settings the form does not manage
+        # (e.g. IMPORT_WORKERS, SCHEMA_RETENTION)
         try:
+            env_values = dotenv_values(ENV_PATH) if os.path.exists(ENV_PATH) else {}
+            env_values.update({
+                "AWS_PROFILE": aws_profile,
+                "S3_LOCATION": s3_path,
+                "REDSHIFT_HOST": host,
+                "REDSHIFT_PORT": port,
+                "REDSHIFT_USER": user,
+                "REDSHIFT_PASSWORD": password,
+            })
             with open(ENV_PATH, "w") as f:
-                f.write(f"AWS_PROFILE={aws_profile}\n")
-                f.write(f"S3_LOCATION={s3_path}\n")
-                f.write(f"REDSHIFT_HOST={host}\n")
-                f.write(f"REDSHIFT_PORT={port}\n")
-                f.write(f"REDSHIFT_USER={user}\n")
-                f.write(f"REDSHIFT_PASSWORD={password}\n")
+                for key, value in env_values.items():
+                    f.write(f"{key}={'' if value is None else value}\n")
         except Exception as e:
             print(f"⚠️ Could not save .env: {e}")
 
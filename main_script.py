@@ -10,9 +10,15 @@ from urllib.parse import urlparse
 import os
 import sys
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 
+from run_history import RunHistory, order_longest_first, is_slowdown
+from schema_retention import apply_retention
+
 # ✅ Ensure we always load latest .env values
 env_path = os.environ.get("DOTENV_PATH", os.path.join(os.getcwd(), ".env"))
 
@@ -62,6 +68,74 @@ def trigger_sso_login(profile: str = None):
         sys.exit(1)
 
 
+def schema_from_s3_path(filepath):
+    # The schema is the fifth path segment, e.g. s3://bucket/a/b/c/<schema>/
+    parts = filepath.replace('s3://', '').split('/')
+    if len(parts) > 4:
+        return parts[4]
+    return None
+
+
+def connect_redshift(dbname):
+    conn = psycopg2.connect(
+        dbname=dbname.lower(),
+        user=os.getenv('REDSHIFT_USER'),
+        password=os.getenv('REDSHIFT_PASSWORD'),
+        host=os.getenv('REDSHIFT_HOST'),
+        port=os.getenv('REDSHIFT_PORT')
+    )
+    conn.autocommit = True  # Automatically commit changes
+    return conn
+
+
+def grant_privileges(cursor, sch_nm):
+    # Grant all on schema
+    cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm}_external TO PUBLIC')
+    cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm} TO PUBLIC')
+
+    # Grant select, insert, update, delete on all tables in schema
+    cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm}_external TO PUBLIC')
+    cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm} TO PUBLIC')
+
+    # Grant privileges on all tables in schema (both current and future)
+    cursor.execute(f"""
+        SELECT table_name 
+        FROM information_schema.tables
+        WHERE table_schema = '{sch_nm}_EXTERNAL' AND table_type = 'BASE TABLE'
+    """)
+    tables_external = cursor.fetchall()
+    for table in tables_external:
+        cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}_external.{table[0]} TO PUBLIC')
+
+    cursor.execute(f"""
+        SELECT table_name 
+        FROM information_schema.tables
+        WHERE table_schema = '{sch_nm}' AND table_type = 'BASE TABLE'
+    """)
+    tables = cursor.fetchall()
+    for table in tables:
+        cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}.{table[0]} TO PUBLIC')
+
+    # Grant privileges on all views in schema
+    cursor.execute(f"""
+        SELECT table_name 
+        FROM information_schema.views
+        WHERE table_schema = '{sch_nm}_EXTERNAL'
+    """)
+    views_external = cursor.fetchall()
+    for view in views_external:
+        cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}_external.{view[0]} TO PUBLIC')
+
+    cursor.execute(f"""
+        SELECT table_name 
+        FROM information_schema.views
+        WHERE table_schema = '{sch_nm}'
+    """)
+    views = cursor.fetchall()
+    for view in views:
+        cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}.{view[0]} TO PUBLIC')
+
+
 # Check if SSO login is needed
 def run_pipeline(logger=print):
     if is_sso_login_required(os.getenv('AWS_PROFILE')):
@@ -90,24 +164,38 @@ def run_pipeline(logger=print):
         logger("❌ S3_LOCATION environment variable is missing.")
         return
 
+    # Number of datasets imported at the same time, each worker uses its own connection
+    import_workers = os.getenv('IMPORT_WORKERS', '1').strip()
+    if not import_workers.isdigit() or int(import_workers) < 1:
+        logger(f"❌ IMPORT_WORKERS must be a whole number of at least 1, got '{import_workers}'.")
+        return
+    import_workers = int(import_workers)
+
     s3_paths_list = s3_paths.split(',')
+    # Schemas imported by this run, the default retention policy only applies to these
+    run_schemas = {schema_from_s3_path(path.strip()) for path in s3_paths_list if 's3://' in path} - {None}
     temp_db = ''
     fnl_schema_list = []
     
     conn = None
     cursor = None
 
+    history = None
+    run_id = None
+
     try:
+        # Per-dataset durations and outcomes, kept across runs for scheduling
+        history = RunHistory(logger=logger)
+        run_id = history.start_run()
+
         for s3_path in sorted(s3_paths_list):
             logger(f'Starting import from the "{s3_path}"')
              
             filepath = s3_path.strip()
             # Basic validation
             if 's3://' in filepath:
-                parts = filepath.replace('s3://', '').split('/')
-                if len(parts) > 4:
-                    schema = parts[4]
-                else:
+                schema = schema_from_s3_path(filepath)
+                if schema is None:
                     logger(f"❌ Invalid S3 Path format: {filepath}")
                     continue
             else:
@@ -115,12 +203,7 @@ def run_pipeline(logger=print):
                  continue
 
             dbname=schema[0].lower()
-            user=os.getenv('REDSHIFT_USER')
-            password=os.getenv('REDSHIFT_PASSWORD')
-            host=os.getenv('REDSHIFT_HOST')
-            port=os.getenv('REDSHIFT_PORT')
 
-            
             if temp_db == '' or temp_db != dbname:
                 if conn:
                     cursor.close()
@@ -130,17 +213,16 @@ def run_pipeline(logger=print):
                 print(f'Connecting to "{dbname}" database') # keep print for stdout debug
                 logger(f'Connecting to "{dbname}" database')
                 # Connect to Redshift
-                conn = psycopg2.connect(
-                    dbname=dbname.lower(),
-                    user=user,
-                    password=password,
-                    host=host,
-                    port=port
-                )
-                conn.autocommit = True  # Automatically commit changes
+                conn = connect_redshift(dbname)
                 cursor = conn.cursor()
                 logger("Database connection successful!")
 
+                # Drop expired daily schemas before importing, keeps the catalog lookups fast
+                try:
+                    apply_retention(cursor, datetime.now().strftime('%Y%m%d'), logger, run_schemas)
+                except Exception as retention_error:
+                    logger(f"Schema retention failed: {retention_error}")
+
             
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             today = datetime.now().strftime('%Y%m%d')
@@ -229,154 +311,81 @@ def run_pipeline(logger=print):
 
                 schema_qry = f'''create schema if not exists {schema}_sls_{today} '''
                 cursor.execute(schema_qry)
-                
-                # Calling import function and building queries for datasets
-                if 'stage1' in s3_path:
-                    queries_set = [ f'''select perm_stage1_{dataset}_530('{today}','{schema}_sls','{filepath}{dataset}')''' for dataset in dataset_list]
-                    # Dropping table if exists
-                    for dataset in dataset_list:
-                        cursor.execute(f'''drop table if exists {sch_nm}_external.perm_stage1_{dataset}''')  
-
-                    i = 0
-
-                    for query in queries_set:
-                        try:
-                            cursor.execute(query)
-                            result = cursor.fetchall()
-                            create_external_query = str(result[0][0]).split(";")[0]  # Create external table query
-                            cursor.execute(create_external_query)
-                            logger(f"External table created: {sch_nm}.perm_stage1_{dataset_list[i]}_external")
-                            create_view_query = str(result[0][0]).split(";")[1]  # Create view query
-                            cursor.execute(create_view_query)
-                            logger(f"View created: {sch_nm}.perm_stage1_{dataset_list[i]}")
-                            i += 1
-
-                            def grant_privileges(cursor, sch_nm):
-                                # Grant all on schema
-                                cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm}_external TO PUBLIC')
-                                cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm} TO PUBLIC')
-
-                                # Grant select, insert, update, delete on all tables in schema
-                                cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm}_external TO PUBLIC')
-                                cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm} TO PUBLIC')
-
-                                # Grant privileges on all tables in schema (both current and future)
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.tables
-                                    WHERE table_schema = '{sch_nm}_EXTERNAL' AND table_type = 'BASE TABLE'
-                                """)
-                                tables_external = cursor.fetchall()
-                                for table in tables_external:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}_external.{table[0]} TO PUBLIC')
-
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.tables
-                                    WHERE table_schema = '{sch_nm}' AND table_type = 'BASE TABLE'
-                                """)
-                                tables = cursor.fetchall()
-                                for table in tables:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}.{table[0]} TO PUBLIC')
-
-                                # Grant privileges on all views in schema
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.views
-                                    WHERE table_schema = '{sch_nm}_EXTERNAL'
-                                """)
-                                views_external = cursor.fetchall()
-                                for view in views_external:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}_external.{view[0]} TO PUBLIC')
-
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.views
-                                    WHERE table_schema = '{sch_nm}'
-                                """)
-                                views = cursor.fetchall()
-                                for view in views:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}.{view[0]} TO PUBLIC')
-
-
-                            grant_privileges(cursor, sch_nm)
-
-                        except Exception as query_error:
-                            logger(f"Error executing query for dataset {dataset_list[i]}: {query_error}")
 
-                    
-                else:                
-                    queries_set = [ f'''select perm_stage_{dataset}_530('{today}','{schema}_sls','{filepath}{dataset}.csv')''' for dataset in dataset_list]
-                    for dataset in dataset_list:
-                        cursor.execute(f'''drop table if exists {sch_nm}_external.perm_stage_{dataset}''') 
-                    # Incremental value for dataset info
-                    i = 0
-                    for query in queries_set:
-                        try:
-                            cursor.execute(query)
-                            result = cursor.fetchall()
-                            create_external_query = str(result[0][0]).split(";")[0]  # Create external table query
-                            cursor.execute(create_external_query)
-                            logger(f"External table created: {sch_nm}.perm_stage_{dataset_list[i]}_external")
-                            create_view_query = str(result[0][0]).split(";")[1]  # Create view query
-                            cursor.execute(create_view_query)
-                            logger(f"View created: {sch_nm}.perm_stage_{dataset_list[i]}")
-                            i += 1
-
-                            def grant_privileges(cursor, sch_nm):
-                                # Grant all on schema
-                                cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm}_external TO PUBLIC')
-                                cursor.execute(f'GRANT ALL ON SCHEMA {sch_nm} TO PUBLIC')
-
-                                # Grant select, insert, update, delete on all tables in schema
-                                cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm}_external TO PUBLIC')
-                                cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {sch_nm} TO PUBLIC')
-
-                                # Grant privileges on all tables in schema (both current and future)
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.tables
-                                    WHERE table_schema = '{sch_nm}_EXTERNAL' AND table_type = 'BASE TABLE'
-                                """)
-                                tables_external = cursor.fetchall()
-                                for table in tables_external:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}_external.{table[0]} TO PUBLIC')
-
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.tables
-                                    WHERE table_schema = '{sch_nm}' AND table_type = 'BASE TABLE'
-                                """)
-                                tables = cursor.fetchall()
-                                for table in tables:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON TABLE {sch_nm}.{table[0]} TO PUBLIC')
-
-                                # Grant privileges on all views in schema
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.views
-                                    WHERE table_schema = '{sch_nm}_EXTERNAL'
-                                """)
-                                views_external = cursor.fetchall()
-                                for view in views_external:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}_external.{view[0]} TO PUBLIC')
-
-                                cursor.execute(f"""
-                                    SELECT table_name 
-                                    FROM information_schema.views
-                                    WHERE table_schema = '{sch_nm}'
-                                """)
-                                views = cursor.fetchall()
-                                for view in views:
-                                    cursor.execute(f'GRANT ALL PRIVILEGES ON VIEW {sch_nm}.{view[0]} TO PUBLIC')
-
-
-                            grant_privileges(cursor, sch_nm)
-
-                        except Exception as query_error:
-                            logger(f"Error executing query for dataset {dataset_list[i]}: {query_error}")
-
-                
+                if 'stage1' in s3_path:
+                    table_prefix, file_suffix = 'perm_stage1_', ''
+                else:
+                    table_prefix, file_suffix = 'perm_stage_', '.csv'
+
+                # Start the longest-expected datasets first so a slow one does not trail the run
+                table_names = {dataset: f'{table_prefix}{dataset}' for dataset in dataset_list}
+                history_expected = history.expected_durations(schema, table_names.values())
+                expected = {dataset: history_expected[table] for dataset, table in table_names.items() if table in history_expected}
+                dataset_list = order_longest_first(dataset_list, expected)
+
+                # Dropping table if exists
+                for dataset in dataset_list:
+                    cursor.execute(f'''drop table if exists {sch_nm}_external.{table_prefix}{dataset}''')
+
+                def import_dataset(cursor, dataset):
+                    # Calling import function for the dataset
+                    cursor.execute(f'''select {table_prefix}{dataset}_530('{today}','{schema}_sls','{filepath}{dataset}{file_suffix}')''')
+                    result = cursor.fetchall()
+                    create_external_query = str(result[0][0]).split(";")[0]  # Create external table query
+                    cursor.execute(create_external_query)
+                    logger(f"External table created: {sch_nm}.{table_prefix}{dataset}_external")
+                    create_view_query = str(result[0][0]).split(";")[1]  # Create view query
+                    cursor.execute(create_view_query)
+                    logger(f"View created: {sch_nm}.{table_prefix}{dataset}")
+
+                def run_dataset(get_cursor, dataset):
+                    table = table_names[dataset]
+                    started_at = datetime.now()
+                    started = time.monotonic()
+                    try:
+                        import_dataset(get_cursor(), dataset)
+                    except Exception as query_error:
+                        logger(f"Error executing query for dataset {dataset}: {query_error}")
+                        history.record(run_id, schema, table, started_at, time.monotonic() - started, 'failed', str(query_error))
+                        return False
+
+                    duration = time.monotonic() - started
+                    history.record(run_id, schema, table, started_at, duration, 'success')
+                    if is_slowdown(duration, expected.get(dataset)):
+                        logger(f"⚠️ {table} took {duration:.0f}s, usually ~{expected[dataset]:.0f}s")
+                    return True
+
+                workers = min(import_workers, len(dataset_list))
+                if workers <= 1:
+                    results = [run_dataset(lambda: cursor, dataset) for dataset in dataset_list]
+                else:
+                    # One connection per worker thread, psycopg2 connections run one query at a time
+                    worker_local = threading.local()
+                    worker_conns = []
+                    worker_conns_lock = threading.Lock()
+
+                    def worker_cursor():
+                        if not hasattr(worker_local, 'cursor'):
+                            worker_conn = connect_redshift(dbname)
+                            with worker_conns_lock:
+                                worker_conns.append(worker_conn)
+                            worker_local.cursor = worker_conn.cursor()
+                        return worker_local.cursor
+
+                    logger(f"Importing {len(dataset_list)} datasets with {workers} workers")
+                    try:
+                        with ThreadPoolExecutor(max_workers=workers) as pool:
+                            results = list(pool.map(lambda dataset: run_dataset(worker_cursor, dataset), dataset_list))
+                    finally:
+                        for worker_conn in worker_conns:
+                            worker_conn.close()
+
+                # Grant once per schema, after every dataset has been created
+                if any(results):
+                    try:
+                        grant_privileges(cursor, sch_nm)
+                    except Exception as grant_error:
+                        logger(f"Error granting privileges on {sch_nm}: {grant_error}")
 
                 logger('Tables have been imported successfully')
                 logger(f'Schema info: {sch_nm}')
@@ -398,6 +407,10 @@ def run_pipeline(logger=print):
             cursor.close()
             conn.close()
             logger("Database connection closed.")
+
+        if history:
+            history.finish_run(run_id)
+            history.close()
         
         logger(f'The final schema : {fnl_schema_list}') 
 
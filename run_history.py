@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from statistics import median
+
+
+# How many recent successful runs feed the expected duration of a dataset
+HISTORY_WINDOW = 5
+
+# A dataset is flagged as slower than usual when it takes at least this many
+# times its expected duration, and at least MIN_SLOWDOWN_SECONDS longer
+SLOWDOWN_FACTOR = 2.0
+MIN_SLOWDOWN_SECONDS = 30.0
+
+
+def history_path():
+    """Where the run history is kept, RUN_HISTORY_PATH or the user's home folder.
+
+    Read at call time so values loaded from .env are picked up, and not the
+    working directory since a Finder-launched app runs with cwd '/'.
+    """
+    return os.getenv('RUN_HISTORY_PATH') or os.path.join(os.path.expanduser('~'), '.sls_run_history.sqlite3')
+
+
+class RunHistory:
+    """Local SQLite store of per-dataset import durations and outcomes.
+
+    The history is best-effort: if the store cannot be opened or written,
+    the problem is logged and the import carries on without it.
+    """
+
+    def __init__(self, path=None, logger=print):
+        self.path = path or history_path()
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript('''
+                create table if not exists runs (
+                    run_id      integer primary key autoincrement,
+                    started_at  text not null,
+                    finished_at text
+                );
+                create table if not exists dataset_runs (
+                    run_id      integer not null references runs(run_id),
+                    schema_name text not null,
+                    dataset     text not null,
+                    started_at  text not null,
+                    duration_s  real not null,
+                    status      text not null,
+                    error       text
+                );
+                create index if not exists ix_dataset_runs_lookup
+                    on dataset_runs (schema_name, dataset, status, started_at);
+            ''')
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self.logger(f"⚠️ Run history unavailable at {self.path}, datasets will not be reordered: {e}")
+            if self._conn:
+                self._conn.close()
+            self._conn = None
+
+    def start_run(self):
+        if self._conn is None:
+            return None
+        with self._lock:
+            try:
+                cur = self._conn.execute(
+                    'insert into runs (started_at) values (?)',
+                    (datetime.now().isoformat(timespec='seconds'),)
+                )
+                self._conn.commit()
+                return cur.lastrowid
+            except sqlite3.Error as e:
+                self.logger(f"⚠️ Could not start run in history: {e}")
+                return None
+
+    def finish_run(self, run_id):
+        if self._conn is None or run_id is None:
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'update runs set finished_at = ? where run_id = ?',
+                    (datetime.now().isoformat(timespec='seconds'), run_id)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.logger(f"⚠️ Could not finish run in history: {e}")
+
+    def record(self, run_id, schema, dataset, started_at, duration_s, status, error=None):
+        """Store the outcome ('success' or 'failed') of a single dataset import."""
+        if self._conn is None:
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    '''insert into dataset_runs
+                       (run_id, schema_name, dataset, started_at, duration_s, status, error)
+                       values (?, ?, ?, ?, ?, ?, ?)''',
+                    (run_id, schema, dataset, started_at.isoformat(timespec='seconds'),
+                     duration_s, status, error)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.logger(f"⚠️ Could not record {dataset} in history: {e}")
+
+    def expected_durations(self, schema, datasets):
+        """Median of the last HISTORY_WINDOW successful durations per dataset.
+
+        Datasets with no successful history are left out of the result, so an
+        unavailable history leaves the order unchanged.
+        """
+        expected = {}
+        if self._conn is None:
+            return expected
+        with self._lock:
+            try:
+                for dataset in datasets:
+                    rows = self._conn.execute(
+                        '''select duration_s from dataset_runs
+                           where schema_name = ? and dataset = ? and status = 'success'
+                           order by started_at desc limit ?''',
+                        (schema, dataset, HISTORY_WINDOW)
+                    ).fetchall()
+                    if rows:
+                        expected[dataset] = median(row[0] for row in rows)
+            except sqlite3.Error as e:
+                self.logger(f"⚠️ Could not read run history: {e}")
+                return {}
+        return expected
+
+    def close(self):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.close()
+            self._conn = None
+
+
+def order_longest_first(datasets, expected):
+    """Order datasets so the longest-expected ones start first.
+
+    Datasets without history are scheduled ahead of everything else since
+    their cost is unknown; ties keep a stable alphabetical order.
+    """
+    return sorted(datasets, key=lambda d: (d in expected, -expected.get(d, 0.0), d))
+
+
+def is_slowdown(duration_s, expected_s):
+    if expected_s is None:
+        return False
+    return (duration_s >= expected_s * SLOWDOWN_FACTOR
+            and duration_s - expected_s >= MIN_SLOWDOWN_SECONDS)
@@ -0,0 +1,164 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2 import sql
+
+
+# Retention is configured through the environment and read at call time so
+# values loaded from .env are picked up:
+#
+#   SCHEMA_RETENTION="*:keep_last=7,sales:keep_days=30"
+#     keep_last=N  keep the N most recent dated schemas
+#     keep_days=N  keep the schemas of the last N calendar days, today included
+#     "*" is the default for the schemas imported by this run (S3_LOCATION),
+#     other entries name a schema explicitly. Nothing is dropped when unset,
+#     and today's schemas are always kept.
+#   SCHEMA_RETENTION_DRY_RUN=1  only report what would be dropped
+#   RETENTION_BATCH_SIZE=20     schemas dropped per DROP SCHEMA statement
+
+POLICY_KINDS = ('keep_last', 'keep_days')
+
+DATED_SCHEMA_RE = re.compile(r'^(?P<base>.+)_sls_(?P<date>\d{8})(?P<external>_external)?$')
+
+# Every date-stamped schema of the current database, local and external, in one lookup
+DATED_SCHEMAS_QUERY = '''
+    select schema_name
+    from svv_all_schemas
+    where database_name = current_database()
+      and schema_name ~ '_sls_[0-9]{8}(_external)?$'
+'''
+
+
+def parse_policies(spec=None):
+    """Parse "schema:kind=N" entries into {schema: (kind, N)}."""
+    if spec is None:
+        spec = os.getenv('SCHEMA_RETENTION', '')
+    policies = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            schema, rule = entry.split(':', 1)
+            kind, value = rule.split('=', 1)
+            value = int(value)
+        except ValueError:
+            raise ValueError(f'Invalid retention policy "{entry}", expected schema:keep_last=N or schema:keep_days=N')
+        kind = kind.strip()
+        if kind not in POLICY_KINDS or value < 0:
+            raise ValueError(f'Invalid retention policy "{entry}", expected schema:keep_last=N or schema:keep_days=N')
+        policies[schema.strip().lower()] = (kind, value)
+    return policies
+
+
+def batch_size():
+    value = os.getenv('RETENTION_BATCH_SIZE', '20').strip()
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"RETENTION_BATCH_SIZE must be a whole number of at least 1, got '{value}'")
+    return int(value)
+
+
+def expired_schemas(schema_names, policies, today, run_schemas=()):
+    """Return the date-stamped schemas that fall outside their retention policy.
+
+    The "*" default only covers the schemas in run_schemas; any other schema
+    needs its own entry. Local and external schemas of the same day are kept
+    or expired together, and today's schemas are always kept.
+    """
+    run_schemas = {schema.lower() for schema in run_schemas}
+    dates_by_base = {}
+    for name in schema_names:
+        match = DATED_SCHEMA_RE.match(name)
+        if match:
+            dates_by_base.setdefault(match['base'], set()).add(match['date'])
+
+    expired_dates = {}
+    for base, dates in dates_by_base.items():
+        policy = policies.get(base.lower())
+        if policy is None and base.lower() in run_schemas:
+            policy = policies.get('*')
+        if policy is None:
+            continue
+        kind, value = policy
+        if kind == 'keep_last':
+            keep = set(sorted(dates, reverse=True)[:value])
+        else:
+            cutoff = (datetime.strptime(today, '%Y%m%d') - timedelta(days=value)).strftime('%Y%m%d')
+            keep = {date for date in dates if date > cutoff}
+        keep.add(today)
+        expired_dates[base] = dates - keep
+
+    expired = []
+    for name in schema_names:
+        match = DATED_SCHEMA_RE.match(name)
+        if match and match['date'] in expired_dates.get(match['base'], ()):
+            expired.append(name)
+    return sorted(expired)
+
+
+def drop_schemas(cursor, names, cascade, logger=print):
+    """Drop names with one statement, falling back to one by one if it fails.
+
+    Returns the names that were dropped.
+    """
+    statement = sql.SQL('drop schema if exists {}' + (' cascade' if cascade else ''))
+    try:
+        cursor.execute(statement.format(sql.SQL(', ').join(map(sql.Identifier, names))))
+        return list(names)
+    except psycopg2.Error as batch_error:
+        if len(names) == 1:
+            logger(f'Schema retention: could not drop {names[0]}: {batch_error}')
+            return []
+
+    dropped = []
+    for name in names:
+        dropped += drop_schemas(cursor, [name], cascade, logger)
+    return dropped
+
+
+def apply_retention(cursor, today, logger=print, run_schemas=(), policies=None, dry_run=None):
+    """Drop expired {schema}_sls_{YYYYMMDD} schemas in the connected database.
+
+    Returns the schemas that were dropped, or that would be in a dry run.
+    """
+    if policies is None:
+        policies = parse_policies()
+    if dry_run is None:
+        dry_run = os.getenv('SCHEMA_RETENTION_DRY_RUN') == '1'
+    if not policies:
+        return []
+    size = batch_size()
+
+    cursor.execute(DATED_SCHEMAS_QUERY)
+    schema_names = [row[0] for row in cursor.fetchall()]
+    expired = expired_schemas(schema_names, policies, today, run_schemas)
+    if not expired:
+        logger('Schema retention: nothing to drop.')
+        return []
+
+    # Views in the local schemas go with them; external schemas only hold a
+    # reference to the shared data catalog database, which must be kept
+    local = [name for name in expired if not name.endswith('_external')]
+    external = [name for name in expired if name.endswith('_external')]
+
+    if dry_run:
+        logger(f'Schema retention (dry run): {len(expired)} schemas would be dropped:')
+        for name in expired:
+            logger(f'  {name}')
+        if local:
+            logger('Schema retention (dry run): local schemas are dropped with CASCADE, which also drops objects in other schemas that depend on them, e.g. views.')
+        return expired
+
+    if local:
+        logger('Schema retention: local schemas are dropped with CASCADE, which also drops objects in other schemas that depend on them, e.g. views.')
+
+    dropped = []
+    for names, cascade in ((local, True), (external, False)):
+        for start in range(0, len(names), size):
+            batch_dropped = drop_schemas(cursor, names[start:start + size], cascade, logger)
+            if batch_dropped:
+                logger(f'Schema retention: dropped {", ".join(batch_dropped)}')
+            dropped += batch_dropped
+    return dropped